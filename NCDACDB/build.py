@@ -1,7 +1,42 @@
 import re
+import numpy as np
 import pandas as pd
 import os
 import sqlite3
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+
+# Numba is optional. When it is installed, the records of *.dat files are
+# copied out by a compiled loop instead of the NumPy fallback.
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Size, in bytes, of the read buffer used for the *.dat and *.des files.
+READ_CHUNK_SIZE = 1 << 20
+
+# Number of rows handed to each executemany call when writing to SQLite.
+INSERT_CHUNK_SIZE = 10000
+
+def _open_text(file_path: str):
+    """
+    Open a text file for reading with a large read buffer, so that big
+    fixed-width files are read in a few large chunks rather than thousands of
+    small ones.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        TextIOWrapper: An open file object.
+    """
+    f = open(file_path, "r", buffering=READ_CHUNK_SIZE)
+    # `_CHUNK_SIZE` is an undocumented attribute of io.TextIOWrapper setting
+    # how many bytes are decoded at a time (8 KiB by default).
+    f._CHUNK_SIZE = READ_CHUNK_SIZE
+    return f
 
 def preprocess_des_file(file_path : str, pattern : str = None, sep : str = "|",
                      names : list = ["Name", "Description", "Type", "Start",
@@ -29,14 +64,14 @@ def preprocess_des_file(file_path : str, pattern : str = None, sep : str = "|",
     # *.des file. As the loop iterates, lines are processed to change the three
     # or more spaces into the appropriate separators, which Pandas will later 
     # use. Each line is appended to the temporary list.
+    if pattern is None:
+        pattern = r"(?<=\S)\s{3,}(?=\S)"
+    prog = re.compile(pattern)
     temp = []
-    with open(file_path, "r") as f:
-        lines = f.readlines()
-    for line in lines:
-        if pattern is None:
-            pattern = "(?<=\S)\s{3,}(?=\S)"
-        updated_text = re.sub(pattern, sep, line)
-        temp.append(updated_text.strip())
+    with _open_text(file_path) as f:
+        for line in f:
+            updated_text = prog.sub(sep, line)
+            temp.append(updated_text.strip())
 
     # Split lines within the temporary list by the separator, then convert the 
     # output to a Pandas DataFrame. Assign the names argument to the DataFrame 
@@ -71,20 +106,122 @@ def get_date_cols(df: pd.DataFrame, var: str = "Name", type: str = "Type",
     assert var in df.columns, f"var ({var}) must be a valid column header name for the DataFrame."
     assert type in df.columns, f"type ({type}) must be a valid column header name for the DataFrame."
     
-    # Transform DataFrame to a dictionary where the key represents the variable
-    # name and the value is the data type listed in the *.des file.
-    out = {}
-    for index, row in df.iterrows():
-        out[row[var]] = row[type]
-
     # If None, set up `value` to the appropriate string filter for the 
-    # dictionary comprehension.
+    # boolean mask.
     if value is None:
         value = "DATE"
-    out = {k: v for k, v in out.items() if v == value}
+
+    # Keep the rows coded as dates and pair the variable names with their
+    # data types.
+    mask = df[type] == value
+    out = dict(zip(df.loc[mask, var], df.loc[mask, type]))
+
+    return out
+
+def get_col_specs(des: pd.DataFrame) -> list:
+    """
+    A minimal function to compute, once per *.des file, where each field of
+    the corresponding *.dat file starts and ends.
+
+    Args:
+        des (pd.DataFrame): A pandas DataFrame representing the *.des file for
+        each data set.
+
+    Returns:
+        List: A list of (name, start, end, is_date) tuples, one per variable,
+        where start and end are zero-indexed, half-open character offsets and
+        is_date flags the `DATE` variables.
+    """
+    assert isinstance(des, pd.DataFrame), "The des must by a Pandas DataFrame object"
+
+    # The *.des file lists one-indexed starting positions and field lengths.
+    dt = get_date_cols(des)
+    start = des["Start"].astype(int) - 1
+    end = start + des["Length"].astype(int)
+    out = [(name, s, e, name in dt)
+           for name, s, e in zip(des["Name"], start.tolist(), end.tolist())]
 
     return out
 
+def _fill_records(buf: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                  out: np.ndarray):
+    """
+    Copy each record of a fixed-width file into a row of `out`, truncated to
+    the width of `out`. Compiled with Numba when it is available.
+
+    Args:
+        buf (np.ndarray): The file contents as an array of code points.
+        starts (np.ndarray): The offset of the first character of each record.
+        ends (np.ndarray): The offset one past the last character of each
+        record.
+        out (np.ndarray): A zeroed array of shape (records, width).
+    """
+    width = out.shape[1]
+    for i in range(len(starts)):
+        n = min(ends[i] - starts[i], width)
+        for k in range(n):
+            out[i, k] = buf[starts[i] + k]
+
+if njit is not None:
+    _fill_records = njit(cache=True)(_fill_records)
+
+def _slice_fixed_width(text: str, colspecs: list) -> list:
+    """
+    Slice the fields out of the decoded text of a fixed-width file with NumPy,
+    without creating a Python object per line or per cell. Offsets are
+    character offsets, so multi-byte characters do not shift later fields.
+    Lines may be shorter than the record layout, in which case the missing
+    fields are empty. Blank lines are skipped and fields are trimmed of their
+    fixed-width padding.
+
+    Args:
+        text (str): The contents of the *.dat file, or a chunk of its lines.
+        colspecs (list): A list of zero-indexed, half-open (start, end) tuples.
+
+    Returns:
+        List: One NumPy string array per column spec, each with one element
+        per record.
+    """
+    # Work on the UTF-32 code points, one array element per character, which
+    # NumPy can view directly as fixed-size strings.
+    buf = np.frombuffer(text.encode("utf-32-le"), dtype="<u4")
+
+    # Locate the start and end of every record from the newline positions,
+    # leaving out a trailing carriage return.
+    ends = np.flatnonzero(buf == ord("\n"))
+    if len(buf) and buf[-1] != ord("\n"):
+        ends = np.append(ends, len(buf))
+    starts = np.r_[0, ends[:-1] + 1][:len(ends)]
+    ends = ends - ((ends > starts) & (buf[np.maximum(ends - 1, 0)] == ord("\r")))
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+
+    # With Numba, copy every record into a NUL-padded (records x width) matrix
+    # in a single compiled pass, then view each column block of the matrix as
+    # fixed-size string values.
+    if njit is not None:
+        width = max((end for _, end in colspecs), default=0)
+        records = np.zeros((len(starts), width), dtype="<u4")
+        _fill_records(buf, starts, ends, records)
+        fields = [np.ascontiguousarray(records[:, start:end])
+                  for start, end in colspecs]
+    # Otherwise copy each field into a contiguous (records x length) block one
+    # character at a time, leaving NUL padding past the end of short lines.
+    else:
+        fields = []
+        for start, end in colspecs:
+            field = np.zeros((len(starts), end - start), dtype="<u4")
+            for k in range(end - start):
+                pos = starts + start + k
+                valid = pos < ends
+                field[valid, k] = buf[pos[valid]]
+            fields.append(field)
+
+    # View every row of a block as one string; the NUL padding is dropped by
+    # NumPy and the spaces by strip.
+    return [np.char.strip(field.view(f"<U{field.shape[1]}").ravel())
+            for field in fields]
+
 def preprocess_dat_file(dat_path: str, des_path: str, fix_dates: bool = True,
                         subset: int = None
                         ) -> pd.DataFrame:
@@ -108,38 +245,33 @@ def preprocess_dat_file(dat_path: str, des_path: str, fix_dates: bool = True,
     assert os.path.exists(dat_path), f"Error: Path {dat_path} does not exist."
     assert os.path.exists(des_path), f"Error: Path {des_path} does not exist."
 
-    # Preprocess the *.des file and then extract date variables for recoding.
+    # Preprocess the *.des file and compute the column specifications, which
+    # include the date variables for recoding.
     des = preprocess_des_file(des_path)
-    dt = get_date_cols(des)
+    specs = get_col_specs(des)
+
+    # Read the text, only as many lines as needed when subsetting, and slice
+    # every column out in bulk.
+    with _open_text(dat_path) as f:
+        text = f.read() if subset is None else "".join(islice(f, subset))
+    cols = _slice_fixed_width(text, [(start, end) for _, start, end, _ in specs])
+    df = pd.DataFrame({name: col.tolist()
+                       for (name, _, _, _), col in zip(specs, cols)},
+                      columns=[name for name, _, _, _ in specs])
+
+    # Recode the date variables column-wise rather than cell by cell.
+    date_cols = [name for name, _, _, is_date in specs if is_date]
+    if fix_dates and date_cols:
+        df[date_cols] = df[date_cols].apply(
+            lambda s: pd.to_datetime(s, errors="coerce").dt.date)
 
-    out = []
-    with open(dat_path, "r") as f:
-        lines = f.readlines()
-
-    if subset is not None:
-        lines = lines[0:subset]
-
-    for line in lines:
-        temp = {}
-        for index, row in des.iterrows():
-            start = int(row["Start"]) - 1
-            end = start + int(row["Length"])
-            if row["Name"] in dt.keys() and fix_dates:
-                temp[row["Name"]] = pd.to_datetime(line.strip()[start:end],
-                                                   errors="coerce").date()
-            else:
-                temp[row["Name"]] = line.strip()[start:end]
-        out.append(temp)
-    
-    # Reshape as a DataFrame.
-    df = pd.DataFrame(out) 
-    
     return df
 
 def list_unique_files(dir_path: str, extensions: tuple = (".dat", ".des")) -> dict:
     """
     Returns a dictionary of grouped files in a directory with the specified 
-    extensions.
+    extensions. Files missing any of their counterparts (e.g. a *.dat file
+    without a *.des file) are skipped.
 
     Args:
         dir_path (str): A directory path containing *.des and *.dat files.
@@ -152,15 +284,24 @@ def list_unique_files(dir_path: str, extensions: tuple = (".dat", ".des")) -> di
     assert os.path.exists(dir_path), f"Error: Path {dir_path} does not exist."
     assert isinstance(extensions, tuple), "The extensions argument must be a tuple."
 
-    files = [file.split(".")[0] for file in os.listdir(dir_path) if file.endswith(tuple(extensions))]
+    # Group the extensions found in the directory by file name in a single
+    # scan.
+    stems = {}
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            stem, ext = os.path.splitext(entry.name)
+            if ext in extensions and entry.is_file():
+                stems.setdefault(stem, set()).add(ext)
+
     npath = lambda a,b,c: os.path.join(a, f"{b}{c}")
     out = {file:{"dat": npath(dir_path, file, ".dat"),
                  "des": npath(dir_path, file, ".des"),
-                 "ids": file} for file in files}
+                 "ids": file} for file, exts in stems.items()
+           if exts >= set(extensions)}
     
     return out
 
-def process_table(kvcombo: dict, **kwargs) -> dict:
+def process_table(kvcombo: dict, **kwargs) -> tuple:
     """
     A routine to process individual *.dat files in conjunction with its
     corresponding *.des file. This ensures that both files are processed AND
@@ -168,25 +309,138 @@ def process_table(kvcombo: dict, **kwargs) -> dict:
 
     Args:
         kvcombo (dict): A dictionary with a "dat" key corresponding to the data 
-        path for a *.dat file and a "des" key for the *.des file.
+        path for a *.dat file, a "des" key for the *.des file, and an "ids" key
+        for the unique dataset name.
     
     Returns:
-        Dictionary: A named dictionary where the key is the unique dataset name
-        and nested within int are the data and description files after 
-        preprocessing.
+        Tuple: The unique dataset name followed by the data and description
+        files after preprocessing.
     """
-    out = {}
     data = preprocess_dat_file(dat_path=kvcombo["dat"],
                                des_path=kvcombo["des"],
                                 **kwargs)
     desc = preprocess_des_file(file_path=kvcombo["des"])
-    out[kvcombo["ids"]] = {
-        "data" : data,
-        "desc" : desc
-    }
-    return out
+    return kvcombo["ids"], data, desc
+
+def _iso_dates(values) -> list:
+    """
+    Format dates as YYYY-MM-DD strings for SQLite, with missing values (NaT)
+    as `None`. Values that are not dates are returned as they are.
+
+    Args:
+        values (iterable): The values of a date column.
+
+    Returns:
+        List: The formatted values.
+    """
+    return [None if pd.isna(v) else v.isoformat() if isinstance(v, date) else v
+            for v in values]
+
+def _insert_rows(conn: sqlite3.Connection, name: str, columns: list, rows,
+                 chunksize: int = INSERT_CHUNK_SIZE):
+    """
+    Create an SQLite table with text columns, replacing any table with the
+    same name, and fill it from an iterable of rows. The INSERT statement is
+    built once and the rows are bound to it in chunks through executemany.
+    The caller is responsible for committing.
 
-def build_sqlite_db(db_name: str, dir_path: str, **kwargs):
+    Args:
+        conn (sqlite3.Connection): An open connection to the target database.
+        name (str): The name for the resulting table.
+        columns (list): The column names.
+        rows (iterable): Tuples of values, one per row.
+        chunksize (int): The number of rows inserted per executemany call.
+    """
+    c = conn.cursor()
+    c.execute(f'DROP TABLE IF EXISTS "{name}"')
+    fields = ", ".join(f'"{col}" TEXT' for col in columns)
+    c.execute(f'CREATE TABLE "{name}" ({fields})')
+    sql = f'INSERT INTO "{name}" VALUES ({", ".join("?" * len(columns))})'
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunksize))
+        if not chunk:
+            break
+        c.executemany(sql, chunk)
+
+def ingest_dat_file(conn: sqlite3.Connection, name: str, dat_path: str,
+                    des_path: str, fix_dates: bool = True, subset: int = None,
+                    chunksize: int = INSERT_CHUNK_SIZE):
+    """
+    A routine to load a *.dat file straight into an SQLite table, without
+    building a DataFrame. The table is created from the matching *.des file
+    and the *.dat file is read and inserted in chunks of lines.
+
+    Args:
+        conn (sqlite3.Connection): An open connection to the target database.
+        name (str): The name for the resulting table. An existing table with
+        the same name is replaced.
+        dat_path (str): The path to the *.dat file.
+        des_path (str): The path to the *.des file.
+        fix_dates (bool): A logical, defaults to `True`, which enables the
+        function to transform date variables from strings to dates.
+        subset (int): For testing purposes, when not None it indicates how many
+        rows should be read.
+        chunksize (int): The number of lines parsed and inserted at a time.
+
+    Returns:
+        None: It writes a table to the database. The caller is responsible
+        for committing.
+    """
+    assert os.path.exists(dat_path), f"Error: Path {dat_path} does not exist."
+    assert os.path.exists(des_path), f"Error: Path {des_path} does not exist."
+    assert isinstance(chunksize, int) and chunksize > 0, f"Error: The chunksize ({chunksize}) must be a positive integer."
+
+    # Preprocess the *.des file and compute the column specifications once,
+    # outside of the line loop.
+    des = preprocess_des_file(des_path)
+    specs = get_col_specs(des)
+    names = [col for col, _, _, _ in specs]
+    date_idx = [i for i, (_, _, _, is_date) in enumerate(specs)
+                if is_date and fix_dates]
+
+    def rows():
+        with _open_text(dat_path) as f:
+            lines = f if subset is None else islice(f, subset)
+            while True:
+                chunk = list(islice(lines, chunksize))
+                if not chunk:
+                    break
+                # Slice every field out of the chunk with the same parser as
+                # preprocess_dat_file, then recode the date columns in bulk.
+                # Missing dates are stored as NULL and valid ones as
+                # YYYY-MM-DD strings.
+                cols = [col.tolist() for col in _slice_fixed_width(
+                    "".join(chunk), [(s, e) for _, s, e, _ in specs])]
+                for i in date_idx:
+                    dates = pd.to_datetime(pd.Series(cols[i]), errors="coerce")
+                    cols[i] = _iso_dates(dates.dt.date)
+                yield from zip(*cols)
+
+    # Create the table, storing every field as text, and insert the rows.
+    _insert_rows(conn, name, names, rows(), chunksize)
+
+def _write_frame(df: pd.DataFrame, name: str, conn: sqlite3.Connection,
+                 date_cols: list = (), chunksize: int = INSERT_CHUNK_SIZE):
+    """
+    Write a DataFrame to an SQLite table, replacing any table with the same
+    name. The caller is responsible for committing.
+
+    Args:
+        df (pd.DataFrame): The data to write.
+        name (str): The name for the resulting table.
+        conn (sqlite3.Connection): An open connection to the target database.
+        date_cols (list): The date columns, stored as YYYY-MM-DD strings.
+        chunksize (int): The number of rows inserted per executemany call.
+    """
+    cols = [_iso_dates(df[col]) if col in date_cols else df[col].tolist()
+            for col in df.columns]
+    _insert_rows(conn, name, df.columns.tolist(), zip(*cols), chunksize)
+
+def build_sqlite_db(db_name: str, dir_path: str, max_workers: int = 1,
+                    fix_dates: bool = True, subset: int = None,
+                    chunksize: int = INSERT_CHUNK_SIZE):
     """
     A routine to generate an SQLite database from the *.dat and *des files
     within a specific directory.
@@ -194,33 +448,73 @@ def build_sqlite_db(db_name: str, dir_path: str, **kwargs):
     Args: 
         db_name (str): The name for the resulting database.
         dir_path (str): A directory path containing *.des and *.dat files.
+        max_workers (int): The number of processes used to parse the files.
+        Defaults to 1, which streams each *.dat file into the database without
+        holding it in memory. With more than one worker (or `None` for one per
+        CPU), whole tables are parsed in parallel as DataFrames and written by
+        the calling process as they complete, which uses more memory.
+        fix_dates (bool): A logical, defaults to `True`, which enables the
+        function to transform date variables from strings to dates.
+        subset (int): For testing purposes, when not None it indicates how many
+        rows should be read from each *.dat file.
+        chunksize (int): The number of rows inserted per executemany call, and
+        with a single worker the number of lines parsed at a time.
 
     Returns: 
-        None: It writes an SQLite file.
+        None: It writes an SQLite file. The file is written without a rollback
+        journal, so if the build fails part-way the file is left incomplete
+        and unusable, and should be deleted before building again.
     """
     assert os.path.exists(dir_path), f"Error: Path {dir_path} does not exist."
+    assert isinstance(chunksize, int) and chunksize > 0, f"Error: The chunksize ({chunksize}) must be a positive integer."
     
     conn = sqlite3.connect(f"{db_name}.sqlite")
-    
-    files = list_unique_files(dir_path=dir_path)
-    
-    for file in files:
-        print(f"Reading {file}...")
-        temp = process_table(kvcombo=files[file], **kwargs)
-        for key in temp.keys():
-            for table in temp[key].keys():
-                print(f"\t Writing:{file}_{table}\n")
-                if table == "data":
-                    temp[key][table].to_sql(name=f"{file}_{table}", con=conn,
-                                            index=False,
-                                            if_exists="replace")
-                if table == "desc":
-                    temp[key][table].to_sql(name=f"{file}_{table}", con=conn,
-                                            index=False,
-                                            if_exists="replace")
-                # TODO fix the lack of PK.
-                # if table == "data":
-                #     sql_command = "ALTER TABLE {tablename} ADD PRIMARY KEY ({pk});".format(tablename=f"{file}_{table}", pk=temp[key][table].columns[0])
-                #     print(sql_command)
-                #     conn.execute(sql_command)
-    conn.close()
\ No newline at end of file
+
+    try:
+        # The database is built from scratch, so trade durability for load
+        # speed: no rollback journal, no fsync, and temporary structures kept
+        # in memory. These settings only last for this connection.
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA temp_store=MEMORY")
+
+        files = list_unique_files(dir_path=dir_path)
+
+        # Write every table inside a single transaction.
+        conn.execute("BEGIN")
+        # TODO fix the lack of PK.
+        if max_workers == 1:
+            for file in files:
+                print(f"Reading {file}...")
+                print(f"\t Writing:{file}_data\n")
+                ingest_dat_file(conn=conn, name=f"{file}_data",
+                                dat_path=files[file]["dat"],
+                                des_path=files[file]["des"],
+                                fix_dates=fix_dates, subset=subset,
+                                chunksize=chunksize)
+                print(f"\t Writing:{file}_desc\n")
+                desc = preprocess_des_file(file_path=files[file]["des"])
+                _write_frame(desc, f"{file}_desc", conn, chunksize=chunksize)
+        else:
+            # Parse the files in separate processes; SQLite only supports one
+            # writer, so the tables are written here as each parse finishes.
+            with ProcessPoolExecutor(max_workers=max_workers) as ex:
+                futures = []
+                for file in files:
+                    print(f"Reading {file}...")
+                    futures.append(ex.submit(process_table,
+                                             kvcombo=files[file],
+                                             fix_dates=fix_dates,
+                                             subset=subset))
+                for future in as_completed(futures):
+                    ids, data, desc = future.result()
+                    print(f"\t Writing:{ids}_data\n")
+                    date_cols = [col for col, _, _, is_date
+                                 in get_col_specs(desc) if is_date]
+                    _write_frame(data, f"{ids}_data", conn, date_cols,
+                                 chunksize)
+                    print(f"\t Writing:{ids}_desc\n")
+                    _write_frame(desc, f"{ids}_desc", conn, chunksize=chunksize)
+        conn.commit()
+    finally:
+        conn.close()
\ No newline at end of file
@@ -15,72 +15,74 @@ import sqlite3
 import os
 
 """Downsizing Approach 1: Downsize by update date"""
-def extract_ids_by_update(db_path: str, date_filter: str,
+def extract_ids_by_update(conn: sqlite3.Connection, date_filter: str,
                           table: str = 'OFNT3AA1_data', 
-                          variable: str = 'DTOFUPDT') -> list:
+                          variable: str = 'DTOFUPDT',
+                          id_variable: str = None) -> list:
     """
     Extract the IDs from the Offender Profile table based on a minimal date.
 
     Args:
-        db_path (str): Input database name.
+        conn (sqlite3.Connection): An open connection to the input database.
         date_filter (str): Date to filter by as a string in YYYY-MM-DD pattern.
         table (str): Defaults to the Offender Profile table (OFNT3AA1).
         variable (str): Date variable used to filter, default to 'DTOFUPDT'.
+        id_variable (str): Identifier variable to extract. If `None`, the first
+        column of the table is used.
 
     Returns:
         List: A list of unique identifiers for profiles edited after a certain
         date.
 
     """
-    assert os.path.exists(db_path), f"Error: Path {db_path} does not exist."
+    assert isinstance(conn, sqlite3.Connection), "conn must be an sqlite3 Connection."
 
-    # Connect to database
-    conn = sqlite3.connect(db_path)
     c = conn.cursor()
+
+    # Default to the first column, which holds the identifier
+    if id_variable is None:
+        c.execute("SELECT name FROM pragma_table_info(?) WHERE cid = 0",
+                  (table,))
+        row = c.fetchone()
+        assert row is not None, f"Error: Table {table} does not exist."
+        id_variable = row[0]
     
-    # Filter the data
-    c.execute(f'SELECT * FROM {table} WHERE {variable} >= \'{date_filter}\'')
+    # Filter the data, binding the date as a parameter and only selecting the
+    # id column
+    c.execute(f'SELECT {id_variable} FROM {table} WHERE {variable} >= ?',
+              (date_filter,))
 
     # Extract id column
-    out = [row[0] for row in c.fetchall()]
-
-    # Close the database connection
-    conn.close()
+    out = [row[0] for row in c]
 
     return out
 
-def extract_datatables_and_ids(db_path: str, only_data: bool = True) -> dict:
+def extract_datatables_and_ids(conn: sqlite3.Connection,
+                               only_data: bool = True) -> dict:
     """
     Extract a dictionary of table names and variable names for DOC personal
     unique identifier.
 
     Args:
-        db_path (str): Input database name.
+        conn (sqlite3.Connection): An open connection to the input database.
         only_data (str): If True the function will only return tables with the
         postfix '_data'.
     
     Returns: A Python dictionary where keys represent table names and values the 
     variable names for the unique personal identifiers.
     """
-    assert os.path.exists(db_path), f"Error: Path {db_path} does not exist."
-    # Connect to database
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
+    assert isinstance(conn, sqlite3.Connection), "conn must be an sqlite3 Connection."
 
-    # Get the names of all tables in the database
-    c.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    table_list = c.fetchall()
+    # Get the names of all tables in the database along with the name of their
+    # first column in a single query
+    c = conn.cursor()
+    c.execute("SELECT m.name, p.name FROM sqlite_master AS m, pragma_table_info(m.name) AS p WHERE m.type = 'table' AND p.cid = 0")
 
-    # Loop through and get names of first column
     out = {}
-    for table in table_list:
-        if only_data:
-            if table[0].endswith('_data'):
-                c.execute("PRAGMA table_info({name})".format(name=table[0]))
-                out[table[0]] = c.fetchone()[1]
-        else: 
-            c.execute("PRAGMA table_info({name})".format(name=table[0]))
-            out[table[0]] = c.fetchone()[1]
+    for table, varname in c:
+        if only_data and not table.endswith('_data'):
+            continue
+        out[table] = varname
     
     return out
 
@@ -88,7 +90,8 @@ def downsize_by_update(input_db: str, output_db: str, date_filter: str):
     """
     Downsizes a the NC DAC database by a temporal filter. The function clones 
     the larger database and filters by a date to retain only records newer than
-    the filter parameter.
+    the filter parameter. Indexes on the identifier of each data table are
+    added to the input database if missing, and kept for later runs.
 
     Args:
         input_db (str): Input database name.
@@ -100,26 +103,59 @@ def downsize_by_update(input_db: str, output_db: str, date_filter: str):
     assert os.path.exists(input_db), f"Error: Path {input_db} does not exist."
     assert not os.path.exists(output_db), f"Error: Path {output_db} already exists."
 
-    # Connect to current and new databases
+    # Connect to current database
     conn_orig = sqlite3.connect(input_db)
     c_orig = conn_orig.cursor()
+
+    # Get table-variable pairings, then the filter ids, reusing the id
+    # variable already found for the Offender Profile table. This happens
+    # before the new database is created, so a failure leaves no file behind.
+    tvar_pairs = extract_datatables_and_ids(conn_orig, False)
+    profile_table = 'OFNT3AA1_data'
+    assert profile_table in tvar_pairs, f"Error: Table {profile_table} does not exist in {input_db}."
+    wanted_list = extract_ids_by_update(conn_orig, date_filter,
+                                        table=profile_table,
+                                        id_variable=tvar_pairs[profile_table])
+
+    # Connect to new database
     conn_new = sqlite3.connect(output_db)
     c_new = conn_new.cursor()
 
-    # Get filter ids and table-variable pairings
-    wanted_list = extract_ids_by_update(input_db, date_filter)
-    wanted_ids = ','.join(f"\'{id}\'" for id in wanted_list)
-    tvar_pairs = extract_datatables_and_ids(input_db, False)
+    # The new database is written once from scratch, so skip the rollback
+    # journal and fsync, hold the file lock, and keep a 256 MiB page cache.
+    # The `main.` prefix scopes these to the new database; unprefixed,
+    # locking_mode would also apply to databases attached later and keep the
+    # original one exclusively locked. temp_store has no schema and applies
+    # to the whole connection.
+    c_new.execute("PRAGMA main.journal_mode=OFF")
+    c_new.execute("PRAGMA main.synchronous=OFF")
+    c_new.execute("PRAGMA main.locking_mode=EXCLUSIVE")
+    c_new.execute("PRAGMA main.cache_size=-262144")
+    c_new.execute("PRAGMA temp_store=MEMORY")
+
+    # Store the filter ids once in a temporary table, rather than inlining
+    # them as a literal in every query
+    c_new.execute("CREATE TEMP TABLE wanted (id TEXT PRIMARY KEY)")
+    c_new.executemany("INSERT OR IGNORE INTO temp.wanted VALUES (?)",
+                      ((id,) for id in wanted_list))
+    conn_new.commit()
 
     # Attach the original database to the new database
     c_new.execute(f"ATTACH \'{input_db}\' AS orig")
+
+    # Index the identifier of each data table in the original database, so
+    # the filters below are index lookups instead of full table scans
+    for table in tvar_pairs.keys():
+        varname = tvar_pairs[table]
+        if table.endswith('_data'):
+            c_new.execute(f"CREATE INDEX IF NOT EXISTS orig.idx_{table}_{varname} ON {table} ({varname})")
     
     # Cycle over tables
     for table in tvar_pairs.keys():
         varname = tvar_pairs[table]
         if table.endswith('_data'):
             # Create a new table in the new database with a filtered copy
-            c_new.execute(f"CREATE TABLE {table} AS SELECT * FROM orig.{table} WHERE {varname} IN ({wanted_ids})")
+            c_new.execute(f"CREATE TABLE {table} AS SELECT o.* FROM orig.{table} AS o JOIN temp.wanted AS w ON o.{varname} = w.id")
         else:
             c_new.execute(f"CREATE TABLE {table} AS SELECT * FROM orig.{table}")
        
@@ -1,7 +1,22 @@
 import requests
+from requests.adapters import HTTPAdapter
 import zipfile
 from bs4 import BeautifulSoup
+import html
+import io
 import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Size, in bytes, up to which a downloaded zip is extracted from memory. Larger
+# archives, or ones whose size is not announced, go through a temporary file.
+MEMORY_MAX_SIZE = 128 << 20
+
+# Matches the target of links to zipped files in the downloads page.
+ZIP_HREF_PATTERN = re.compile(r"""href\s*=\s*["']([^"']+\.zip)["']""",
+                              re.IGNORECASE)
 
 def get_zipped_paths(url: str = None) -> list:
     """
@@ -19,8 +34,13 @@ def get_zipped_paths(url: str = None) -> list:
     if url is None:
         url = 'https://webapps.doc.state.nc.us/opi/downloads.do?method=view'
     response = requests.get(url)
-    soup = BeautifulSoup(response.content, 'html.parser')
-    zip_urls = [link['href'] for link in soup.find_all('a', href = True) if link['href'].endswith('zip')]
+    # Pull the links out with a regular expression rather than building the
+    # whole document tree. Fall back to parsing the page if nothing matches,
+    # in case its markup changes.
+    zip_urls = [html.unescape(href) for href in ZIP_HREF_PATTERN.findall(response.text)]
+    if not zip_urls:
+        soup = BeautifulSoup(response.content, 'html.parser')
+        zip_urls = [link['href'] for link in soup.find_all('a', href = True) if link['href'].endswith('zip')]
     return zip_urls
 
 def unzip_file(zip_path: str, extract_path: str = None):
@@ -28,9 +48,11 @@ def unzip_file(zip_path: str, extract_path: str = None):
     Unzip files.
 
     Args:
-        zip_path (str): A path to a zipped file which is unzipped.
+        zip_path (str): A path to a zipped file which is unzipped, or an open
+        binary file object holding the zipped file.
         extract_path (str): A path to store unzipped files, in `None` it will 
-        use the parent directory for the zipped file. Default is `None`.
+        use the parent directory for the zipped file. Default is `None`, which
+        requires `zip_path` to be a path.
     """
     if extract_path is None:
         extract_path = os.path.dirname(zip_path)
@@ -38,7 +60,8 @@ def unzip_file(zip_path: str, extract_path: str = None):
         zip_ref.extractall(extract_path)
 
 def download_file(url: str, extract_path: str, local_name: str = None,
-                  unzip: bool = True, cleanup: bool = True):
+                  unzip: bool = True, cleanup: bool = True,
+                  session: requests.Session = None):
     """
     Download files from a URL
 
@@ -48,40 +71,78 @@ def download_file(url: str, extract_path: str, local_name: str = None,
         local_name (str): Local name for the download. In `None`, the last particle
         of the URL is used.
         unzip (bool): If `True`, the function unzips the file. Defaults to `True`.
+        cleanup (bool): If `True`, the zipped file is not kept in the
+        destination. When unzipping, it is then extracted straight from the
+        download without being saved. Defaults to `True`.
+        session (requests.Session): A session to reuse connections across
+        downloads. If `None`, a one-off request is made.
     """
+    # Nothing would be kept, so skip the download altogether.
+    if cleanup and not unzip:
+        return
+
+    if session is None:
+        session = requests
     try:
-        response = requests.get(url)
+        response = session.get(url, stream=True)
     except requests.exceptions.RequestException as e:
         raise ValueError(f'Failed to make request to {url}') from e
-    
+
     if local_name is None: 
         local_name = url.split('/')[-1]
     file_path = os.path.join(extract_path, local_name)
-    with open(file_path, 'wb') as file:
-        file.write(response.content)
-    
-    if unzip:
-        unzip_file(zip_path=file_path)
 
-    if cleanup:
-        try:
-            os.remove(file_path)
-        except FileNotFoundError:
-            print(f"File '{file_path}' not found.")
-        except PermissionError:
-            print(f"Permission denied while trying to delete '{file_path}'.")
-        except OSError as e:
-            print(f"Error deleting file '{file_path}': {e}")
+    # Stream the body in 1 MiB pieces rather than holding the whole zip in
+    # memory at once.
+    with response:
+        response.raw.decode_content = True
+        if cleanup:
+            # Extract straight from the download instead of saving the zip to
+            # the destination, reading it back and deleting it. Archives of a
+            # known size up to MEMORY_MAX_SIZE are held in memory; others go
+            # through an anonymous temporary file to keep memory bounded.
+            # (SpooledTemporaryFile would do both, but zipfile needs
+            # seekable(), which it only provides from Python 3.11.)
+            size = int(response.headers.get('Content-Length') or 0)
+            if 0 < size <= MEMORY_MAX_SIZE:
+                buf = io.BytesIO()
+            else:
+                buf = tempfile.TemporaryFile()
+            with buf:
+                shutil.copyfileobj(response.raw, buf, length=1 << 20)
+                buf.seek(0)
+                unzip_file(zip_path=buf, extract_path=extract_path)
+        else:
+            with open(file_path, 'wb') as file:
+                shutil.copyfileobj(response.raw, file, length=1 << 20)
+            if unzip:
+                unzip_file(zip_path=file_path)
 
-def unpack_zipped_paths(url_list: list, extract_path: str, **kwargs):
+def unpack_zipped_paths(url_list: list, extract_path: str,
+                        max_workers: int = 8, **kwargs):
     """
     Unpack zipped files.
     
     Args:
         url_list (list): A list of zipped files.
         extract_path (str): A location to dump unzipped files.
+        max_workers (int): The number of files downloaded at the same time.
+        Defaults to 8.
     """
     if not os.path.exists(extract_path):
         os.makedirs(extract_path)
-    for url in url_list:
-        download_file(url=url, extract_path=extract_path, **kwargs)
\ No newline at end of file
+    # Downloads are bound by the network rather than the CPU, so run them in
+    # threads sharing one session and its pool of open connections.
+    with requests.Session() as session, \
+            ThreadPoolExecutor(max_workers=max_workers) as ex:
+        # Size the connection pool to the number of threads, otherwise
+        # connections beyond the default 10 per host are discarded.
+        adapter = HTTPAdapter(pool_maxsize=max_workers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        futures = [ex.submit(download_file, url=url,
+                             extract_path=extract_path, session=session,
+                             **kwargs)
+                   for url in url_list]
+        for future in futures:
+            future.result()
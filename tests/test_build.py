@@ -0,0 +1,85 @@
+import locale
+import sqlite3
+
+import pytest
+
+from NCDACDB import build
+from NCDACDB.build import build_sqlite_db, preprocess_dat_file
+
+DES = """Name        Description                 Type      Start     Length
+CMDORNUM    Offender number             CHAR      1         7
+NAME        Offender name               CHAR      8         12
+DTOFUPDT    Date of update              DATE      20        10
+STATUS      Status                      CHAR      30        3
+"""
+
+DAT = ("0000001JOSÉ PÉREZ  2021-01-01ACT\n"
+       "0000002JANE ROE    2019-01-12INA\r\n"
+       "\n"
+       "0000003BOB         \n"
+       "0000004ANN LEE     not a dateACT")
+
+EXPECTED = [("0000001", "JOSÉ PÉREZ", "2021-01-01", "ACT"),
+            ("0000002", "JANE ROE", "2019-01-12", "INA"),
+            ("0000003", "BOB", None, ""),
+            ("0000004", "ANN LEE", None, "ACT")]
+
+
+@pytest.fixture
+def rawdata(tmp_path):
+    encoding = locale.getpreferredencoding(False)
+    try:
+        DAT.encode(encoding)
+    except UnicodeEncodeError:
+        pytest.skip(f"The locale encoding ({encoding}) cannot hold the fixture.")
+    dir_path = tmp_path / "rawdata"
+    dir_path.mkdir()
+    (dir_path / "TEST.des").write_text(DES, encoding=encoding)
+    with open(dir_path / "TEST.dat", "w", encoding=encoding, newline="") as f:
+        f.write(DAT)
+    return dir_path
+
+
+def read_table(db_path, table):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(f"SELECT * FROM {table}").fetchall()
+    conn.close()
+    return rows
+
+
+@pytest.mark.parametrize("use_numba", [True, False])
+def test_build_paths_match(rawdata, tmp_path, monkeypatch, use_numba):
+    if not use_numba:
+        monkeypatch.setattr(build, "njit", None)
+    elif build.njit is None:
+        pytest.skip("Numba is not installed.")
+
+    build_sqlite_db(str(tmp_path / "serial"), str(rawdata), max_workers=1)
+    build_sqlite_db(str(tmp_path / "parallel"), str(rawdata), max_workers=2)
+
+    serial = read_table(tmp_path / "serial.sqlite", "TEST_data")
+    parallel = read_table(tmp_path / "parallel.sqlite", "TEST_data")
+    assert serial == EXPECTED
+    assert parallel == EXPECTED
+
+
+def test_preprocess_dat_file_subset(rawdata):
+    df = preprocess_dat_file(str(rawdata / "TEST.dat"), str(rawdata / "TEST.des"),
+                             fix_dates=False, subset=2)
+    assert df.values.tolist() == [["0000001", "JOSÉ PÉREZ", "2021-01-01", "ACT"],
+                                  ["0000002", "JANE ROE", "2019-01-12", "INA"]]
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_build_options(rawdata, tmp_path, max_workers):
+    db_name = str(tmp_path / f"db{max_workers}")
+    build_sqlite_db(db_name, str(rawdata), max_workers=max_workers,
+                    fix_dates=False, subset=2, chunksize=1)
+    assert read_table(f"{db_name}.sqlite", "TEST_data") == \
+        [("0000001", "JOSÉ PÉREZ", "2021-01-01", "ACT"),
+         ("0000002", "JANE ROE", "2019-01-12", "INA")]
+
+
+def test_build_rejects_bad_chunksize(rawdata, tmp_path):
+    with pytest.raises(AssertionError):
+        build_sqlite_db(str(tmp_path / "db"), str(rawdata), chunksize=0)
@@ -0,0 +1,102 @@
+import sqlite3
+
+import pytest
+
+from NCDACDB import downsize
+from NCDACDB.build import build_sqlite_db
+from NCDACDB.downsize import downsize_by_update
+
+PROFILE_DES = """Name        Description                 Type      Start     Length
+CMDORNUM    Offender number             CHAR      1         7
+NAME        Offender name               CHAR      8         10
+DTOFUPDT    Date of update              DATE      18        10
+"""
+
+PROFILE_DAT = ("0000001JOHN DOE  2021-05-01\n"
+               "0000002JANE ROE  2019-01-12\n"
+               "0000003BOB SMITH 2020-06-30\n")
+
+SENTENCE_DES = """Name        Description                 Type      Start     Length
+CMDORNUM    Offender number             CHAR      1         7
+CODE        Sentence code               CHAR      8         3
+"""
+
+SENTENCE_DAT = ("0000001ABC\n"
+                "0000001DEF\n"
+                "0000002GHI\n"
+                "0000003JKL\n"
+                "0000009MNO\n")
+
+
+@pytest.fixture
+def input_db(tmp_path):
+    dir_path = tmp_path / "rawdata"
+    dir_path.mkdir()
+    (dir_path / "OFNT3AA1.des").write_text(PROFILE_DES)
+    (dir_path / "OFNT3AA1.dat").write_text(PROFILE_DAT)
+    (dir_path / "SENT.des").write_text(SENTENCE_DES)
+    (dir_path / "SENT.dat").write_text(SENTENCE_DAT)
+    build_sqlite_db(str(tmp_path / "ncdacdb"), str(dir_path))
+    return tmp_path / "ncdacdb.sqlite"
+
+
+# The real connect, kept before the test patches it.
+connect = sqlite3.connect
+
+
+def can_write(db_path):
+    conn = connect(db_path, timeout=0)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS probe (a)")
+        conn.commit()
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+def test_downsize_by_update(input_db, tmp_path, monkeypatch):
+    output_db = tmp_path / "sub.sqlite"
+
+    # Check that another connection can write to the input database right
+    # before it is detached, i.e. after the indexes were created on it.
+    probes = []
+
+    def traced_connect(path, *args, **kwargs):
+        conn = connect(path, *args, **kwargs)
+        if str(path) == str(output_db):
+            conn.set_trace_callback(
+                lambda sql: probes.append(can_write(input_db))
+                if sql.startswith("DETACH") else None)
+        return conn
+
+    monkeypatch.setattr(downsize.sqlite3, "connect", traced_connect)
+    downsize_by_update(str(input_db), str(output_db), "2020-01-01")
+    monkeypatch.undo()
+    assert probes == [True]
+
+    # Every data table matches an IN filter on the ids updated since the
+    # date, and description tables are copied whole.
+    orig = sqlite3.connect(input_db)
+    new = sqlite3.connect(output_db)
+    ids = "SELECT CMDORNUM FROM OFNT3AA1_data WHERE DTOFUPDT >= '2020-01-01'"
+    for table in ("OFNT3AA1_data", "SENT_data"):
+        expected = orig.execute(
+            f"SELECT * FROM {table} WHERE CMDORNUM IN ({ids}) ORDER BY 1, 2"
+        ).fetchall()
+        assert expected
+        assert new.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall() == expected
+    for table in ("OFNT3AA1_desc", "SENT_desc"):
+        assert new.execute(f"SELECT * FROM {table}").fetchall() == \
+            orig.execute(f"SELECT * FROM {table}").fetchall()
+
+    # The id columns of the input data tables are indexed.
+    indexes = {row[0] for row in orig.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_OFNT3AA1_data_CMDORNUM", "idx_SENT_data_CMDORNUM"} <= indexes
+    orig.close()
+    new.close()
+
+    # The input database is not left locked afterwards either.
+    assert can_write(input_db)